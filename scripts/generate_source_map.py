@@ -1,12 +1,58 @@
 #!/usr/bin/env python3
+import json
+import mmap
+import os
+import re
+import stat
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, TextIO, Tuple
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 SRC_DIR = PROJECT_ROOT / "src"
 TESTS_DIR = PROJECT_ROOT / "tests"
 OUTPUT_FILE = SRC_DIR / "README.md"
+# Line counts from previous runs, keyed by path and invalidated by mtime/size
+CACHE_FILE = Path(__file__).resolve().parent / ".cache" / "source_map_linecounts.json"
+# Bump whenever the LoEC counting rules change, so stale counts are discarded
+CACHE_VERSION = 1
+
+# Match empty lines and lines starting with // or /// (after leading whitespace).
+# Lines end at \n only and whitespace means ASCII [ \t\r\f\v]: unlike str.strip(),
+# Unicode whitespace (e.g. U+00A0, U+2028) does not blank a line, nor does a lone
+# \r split one.
+# Anchoring on a literal newline lets the regex engine jump between newlines
+# instead of attempting a match at every byte, so the first line is checked
+# separately. The rest of the line sits in a lookahead, so every match is the
+# single byte b"\n", which CPython shares, and findall() allocates no per-line
+# objects.
+NON_CODE_LINE = re.compile(rb"\n(?=[ \t\r\f\v]*(?://|\n|\Z))")
+NON_CODE_FIRST_LINE = re.compile(rb"(?=[ \t\r\f\v]*(?://|\n|\Z))")
+
+# Files larger than this are memory-mapped rather than read into a bytes object
+MMAP_THRESHOLD = 256 * 1024
+# Slice size used when counting newlines in a memory-mapped file
+CHUNK_SIZE = 1 << 20
+# Write buffer for the generated markdown
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Directory scans mostly wait on the kernel, so oversubscribe the CPUs
+SCAN_WORKERS = (os.cpu_count() or 1) * 4
+# Past this many pending directories, scanning moves onto a thread pool
+SCAN_POOL_THRESHOLD = 512
+# Files handed to each line-counting worker process at a time
+COUNT_CHUNKSIZE = 16
+# Below this many uncached files a process pool costs more than it saves
+INLINE_COUNT_LIMIT = 1024
+
+# Markdown row templates for file listings
+FILE_ENTRY = "- **[{name}]({rel})** – `{lines} LoEC (Lines of Executable Code)`\n"
+FILE_ENTRY_WITH_DESC = "- **[{name}]({rel})** – `{lines} LoEC (Lines of Executable Code)` – {desc}\n"
+
+# Returned for paths without a description; compared by identity
+NO_DESC = "No description available."
 
 # Descriptions for known files/folders using relative paths to src/
 DESCRIPTIONS = {
@@ -119,6 +165,41 @@ TEST_DESCRIPTIONS = {
     "display_theme_config.rs": "Tests for theme config loading and fallback.",
 }
 
+# Freeze the description maps so they cannot be modified at runtime
+DESCRIPTIONS = MappingProxyType(DESCRIPTIONS)
+TEST_DESCRIPTIONS = MappingProxyType(TEST_DESCRIPTIONS)
+
+
+# Parent index passed to DirTable.add for a tree root
+NO_PARENT = -1
+# Child index that marks a file row in tree_items
+FILE_ROW = -1
+
+
+class DirTable:
+    """
+    Column-oriented table of scanned directories, addressed by index.
+    Row i holds the i-th directory's name, description, child directory
+    indices and (name, description, line count) file tuples.
+    """
+
+    def __init__(self):
+        self.name: List[str] = []
+        self.desc: List[str] = []
+        self.children: List[List[int]] = []
+        self.files: List[List[Tuple[str, str, int]]] = []
+
+    def add(self, parent: int, name: str, desc: str = NO_DESC) -> int:
+        """Append an empty directory row under `parent` and return its index."""
+        index = len(self.name)
+        self.name.append(name)
+        self.desc.append(desc)
+        self.children.append([])
+        self.files.append([])
+        if parent != NO_PARENT:
+            self.children[parent].append(index)
+        return index
+
 
 def describe(path: Path, base: Path = None) -> str:
     """Get description for a file or directory."""
@@ -126,42 +207,171 @@ def describe(path: Path, base: Path = None) -> str:
         base = SRC_DIR
     rel = path.relative_to(base).as_posix()
     descriptions = TEST_DESCRIPTIONS if base == TESTS_DIR else DESCRIPTIONS
-    return descriptions.get(rel, "No description available.")
+    return descriptions.get(rel, NO_DESC)
+
+
+def is_cache_entry(entry) -> bool:
+    """Check that a cached value is an [mtime_ns, size, count] list of ints."""
+    return (
+        isinstance(entry, list)
+        and len(entry) == 3
+        and all(type(value) is int for value in entry)
+    )
+
+
+class LineCountCache:
+    """
+    Line counts loaded from the previous run plus those used in this one.
+    Keys are posix paths relative to PROJECT_ROOT. Only entries used in this
+    run are saved, so deleted and renamed files drop out of the cache.
+    """
+
+    def __init__(self, previous: Dict[str, List[int]] = None):
+        self.previous = previous if previous is not None else {}
+        self.current: Dict[str, List[int]] = {}
 
+    @staticmethod
+    def key(path: Path) -> str:
+        """Cache key for a file under PROJECT_ROOT."""
+        return path.relative_to(PROJECT_ROOT).as_posix()
 
-def line_count(path: Path) -> int:
-    """Count lines of executable code in a file, ignoring comments and empty lines."""
+    def get(self, path: Path, st: os.stat_result) -> Optional[int]:
+        """Return the cached count if the file's mtime and size are unchanged."""
+        key = self.key(path)
+        entry = self.previous.get(key)
+        if is_cache_entry(entry) and entry[:2] == [st.st_mtime_ns, st.st_size]:
+            self.current[key] = entry
+            return entry[2]
+        return None
+
+    def put(self, path: Path, st: os.stat_result, count: int):
+        """Record a freshly computed count."""
+        self.current[self.key(path)] = [st.st_mtime_ns, st.st_size, count]
+
+
+def load_cache() -> LineCountCache:
+    """Load cached line counts from the previous run, if any."""
     try:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            count = 0
-            for line in f:
-                stripped = line.strip()
-                # Skip empty lines and lines starting with // or ///
-                if stripped and not stripped.startswith(("///", "//")):
-                    count += 1
-            return count
-    except Exception:
+        data = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return LineCountCache()
+    # Valid JSON of the wrong shape or version is treated like a missing cache
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return LineCountCache()
+    entries = data.get("entries")
+    return LineCountCache(entries if isinstance(entries, dict) else {})
+
+
+def save_cache(cache: LineCountCache):
+    """Persist the line counts used in this run for the next one."""
+    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    CACHE_FILE.write_text(
+        json.dumps({"version": CACHE_VERSION, "entries": cache.current}), encoding="utf-8"
+    )
+
+
+def count_code_lines(buf) -> int:
+    """Count code lines in a bytes object or memory map."""
+    if isinstance(buf, bytes):
+        newlines = buf.count(b"\n")
+    else:
+        # mmap has no count(); slicing copies at most CHUNK_SIZE bytes at a time
+        newlines = sum(
+            buf[i : i + CHUNK_SIZE].count(b"\n") for i in range(0, len(buf), CHUNK_SIZE)
+        )
+    # Every newline opens a new line, and the regex also matches the empty
+    # trailing line after a final newline, so the two cancel out.
+    non_code = len(NON_CODE_LINE.findall(buf))
+    if NON_CODE_FIRST_LINE.match(buf):
+        non_code += 1
+    return newlines + 1 - non_code
+
+
+def line_count(path: Path, st: os.stat_result) -> int:
+    """
+    Count lines of executable code in a file, ignoring comments and empty lines.
+    `st` is the file's stat result, already fetched while scanning its directory.
+    """
+    if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
         return 0
 
+    try:
+        if st.st_size > MMAP_THRESHOLD:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return count_code_lines(mm)
+        return count_code_lines(path.read_bytes())
+    except (OSError, ValueError):
+        # ValueError: mmap refuses a file truncated to 0 bytes since it was stat'd
+        return 0
+
+
+def available_cpus() -> int:
+    """Number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity is Linux-only
+        return os.cpu_count() or 1
+
+
+def count_lines(
+    files: List[Tuple[Path, os.stat_result]], cache: LineCountCache = None
+) -> Dict[Path, int]:
+    """
+    Count lines of executable code for many files at once.
+    Files whose mtime and size match the cache are not read; the rest are
+    counted (in parallel worker processes for large batches on multi-CPU
+    machines) and stored back into the cache.
+    """
+    counts = {}
+    misses = []
+    for path, st in files:
+        cached = cache.get(path, st) if cache is not None else None
+        if cached is not None:
+            counts[path] = cached
+        else:
+            misses.append((path, st))
+
+    if not misses:
+        return counts
+
+    paths, stats = zip(*misses)
+    if len(misses) <= INLINE_COUNT_LIMIT or available_cpus() == 1:
+        # Worker processes cannot win back their startup cost here
+        results = list(map(line_count, paths, stats))
+    else:
+        # Imported here: pulling in multiprocessing costs more than counting a
+        # small tree, and most runs never start the pool
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=available_cpus()) as pool:
+            results = list(pool.map(line_count, paths, stats, chunksize=COUNT_CHUNKSIZE))
+
+    for path, st, count in zip(paths, stats, results):
+        counts[path] = count
+        if cache is not None:
+            cache.put(path, st, count)
+    return counts
+
 
-def is_rust_file(path: Path) -> bool:
-    """Check if a file is a Rust source file."""
-    return path.suffix == ".rs"
+def is_rust_file(name: str) -> bool:
+    """Check if a file name is a Rust source file."""
+    return name.endswith(".rs")
 
 
-def generate_tree(base: Path, root: Path = None) -> Dict:
+def scan_dir(base: Path) -> Tuple[List[Tuple[Path, os.stat_result]], List[Path]]:
     """
-    Recursively generate a tree structure of the directory.
-    Returns dict with 'files' (list of tuples) and 'dirs' (dict of subdirs).
+    List a single directory without recursing into it.
+    Returns the included files (with their stat results) and the subdirectories
+    still to be scanned.
     """
-    if root is None:
-        root = SRC_DIR
-    result = {"files": [], "dirs": {}}
+    files, subdirs = [], []
 
     try:
-        entries = sorted(base.iterdir())
+        with os.scandir(base) as it:
+            entries = sorted(it, key=lambda e: e.name)
     except PermissionError:
-        return result
+        return files, subdirs
 
     for entry in entries:
         # Skip hidden files and common ignore patterns
@@ -172,56 +382,166 @@ def generate_tree(base: Path, root: Path = None) -> Dict:
         ]:
             continue
 
-        if entry.is_file():
+        # One lstat per entry: it classifies the entry and, for files, is reused
+        # to validate cached line counts. Symlinks are never followed, so they
+        # cannot form loops.
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        file_type = stat.S_IFMT(st.st_mode)
+
+        if file_type == stat.S_IFREG:
             # Only include Rust files and README
-            if is_rust_file(entry) or entry.name == "README.md":
-                result["files"].append((entry.name, describe(entry, root), line_count(entry)))
-        elif entry.is_dir():
-            result["dirs"][entry.name] = generate_tree(entry, root)
+            if is_rust_file(entry.name) or entry.name == "README.md":
+                files.append((Path(entry.path), st))
+        elif file_type == stat.S_IFDIR:
+            subdirs.append(Path(entry.path))
 
-    return result
+    return files, subdirs
 
 
-def build_tree_visual(
-    base: Path, tree: Dict, prefix: str = "", is_last: bool = True
-) -> List[str]:
+def scan_tree(base: Path) -> Dict[Path, Tuple[List[Tuple[Path, os.stat_result]], List[Path]]]:
     """
-    Build a visual tree representation with box-drawing characters.
-    Returns a list of strings representing the tree.
+    Scan every directory below `base`, keyed by directory path.
+    Directories are scanned inline from a stack until more than
+    SCAN_POOL_THRESHOLD are pending, then the rest go to scan_tree_pooled.
     """
-    lines = []
+    scans = {}
+    stack = [base]
+
+    while stack:
+        if len(stack) > SCAN_POOL_THRESHOLD:
+            scan_tree_pooled(stack, scans)
+            break
+        path = stack.pop()
+        _, subdirs = scans[path] = scan_dir(path)
+        stack.extend(subdirs)
+
+    return scans
+
+
+def scan_tree_pooled(
+    paths: List[Path],
+    scans: Dict[Path, Tuple[List[Tuple[Path, os.stat_result]], List[Path]]],
+):
+    """Scan `paths` and everything below them as separate tasks on a thread pool."""
+    # Imported here: concurrent.futures costs more to import than scanning a
+    # small tree, and most runs never start the pool
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        pending = {pool.submit(scan_dir, path): path for path in paths}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                _, subdirs = scans[pending.pop(future)] = future.result()
+                for subdir in subdirs:
+                    pending[pool.submit(scan_dir, subdir)] = subdir
+
+
+def generate_tree(
+    table: DirTable,
+    base: Path,
+    descriptions: Mapping[str, str] = DESCRIPTIONS,
+    cache: LineCountCache = None,
+) -> Tuple[int, int, int]:
+    """
+    Generate a tree structure of the directory in two phases: directories are
+    scanned with scan_tree (I/O-bound), then the collected Rust files are
+    counted with count_lines (CPU-bound).
+    Appends the directories to `table` in name order and returns the root index
+    with the total number of files and lines in the tree.
+    """
+    scans = scan_tree(base)
 
-    # Combine files and directories for unified sorting
-    items = []
+    # Only Rust sources count towards LoEC; README files are listed but never read
+    rust_files = [
+        (path, st) for files, _ in scans.values() for path, st in files if is_rust_file(path.name)
+    ]
+    counts = count_lines(rust_files, cache)
+    return join_tree(table, base, scans, counts, descriptions)
 
-    # Add directories
-    for dirname in sorted(tree["dirs"].keys()):
-        items.append(("dir", dirname, tree["dirs"][dirname]))
 
-    # Add files
-    for filename, _, line_cnt in tree["files"]:
-        items.append(("file", filename, line_cnt))
+def join_tree(
+    table: DirTable,
+    base: Path,
+    scans: Dict[Path, Tuple[List[Tuple[Path, os.stat_result]], List[Path]]],
+    counts: Dict[Path, int],
+    descriptions: Mapping[str, str],
+) -> Tuple[int, int, int]:
+    """
+    Append the scanned directories and their line counts to the table.
+    Each stack frame carries the posix path of its directory relative to the
+    tree root (with a trailing slash), so descriptions are looked up without
+    recomputing it.
+    Frames also carry whether the directory sits under a top-level component
+    that has any description at all; lookups are skipped entirely when not.
+    Returns the root index with the total number of files and lines.
+    """
+    known_roots = frozenset(key.split("/", 1)[0] for key in descriptions)
+    root = table.add(NO_PARENT, base.name)
+    stack = deque([(root, base, "", True)])
+    total_files = total_lines = 0
+
+    while stack:
+        index, path, rel_prefix, documented = stack.pop()
+        files, subdirs = scans[path]
+        for file, _ in files:
+            lines = counts.get(file, 0)
+            desc = descriptions.get(rel_prefix + file.name, NO_DESC) if documented else NO_DESC
+            table.files[index].append((file.name, desc, lines))
+            total_lines += lines
+        total_files += len(files)
+        for subdir in subdirs:
+            rel = rel_prefix + subdir.name
+            # Only the root's children decide; deeper directories inherit
+            child_documented = subdir.name in known_roots if index == root else documented
+            desc = descriptions.get(rel, NO_DESC) if child_documented else NO_DESC
+            child = table.add(index, subdir.name, desc)
+            stack.append((child, subdir, f"{rel}/", child_documented))
+
+    return root, total_files, total_lines
+
+
+def tree_items(table: DirTable, index: int, prefix: str) -> List[Tuple[str, str, bool, int]]:
+    """
+    List the children of a directory in display order (directories first).
+    Returns (prefix, name, is_last, child) tuples; child is FILE_ROW for files.
+    """
+    # Both columns keep the sorted order entries were scanned in
+    items = [(table.name[child], child) for child in table.children[index]]
+    items.extend((filename, FILE_ROW) for filename, _, _ in table.files[index])
+    return [
+        (prefix, name, idx == len(items) - 1, child)
+        for idx, (name, child) in enumerate(items)
+    ]
+
+
+def build_tree_visual(table: DirTable, root: int) -> List[str]:
+    """
+    Build a visual tree representation with box-drawing characters.
+    Returns a list of strings representing the tree.
+    """
+    lines = []
 
-    # Process all items
-    for idx, (item_type, name, data) in enumerate(items):
-        is_last_item = idx == len(items) - 1
+    # Children are pushed in reverse so they pop off the stack in display order
+    stack = deque(reversed(tree_items(table, root, "")))
+    while stack:
+        prefix, name, is_last, child = stack.pop()
 
         # Choose the correct branch character
-        if is_last_item:
+        if is_last:
             connector = "╰── "
             extension = "    "
         else:
             connector = "├── "
             extension = "│   "
 
-        if item_type == "dir":
+        if child != FILE_ROW:
             # Directory
             lines.append(f"{prefix}{connector}{name}/")
-            # Recurse into subdirectory
-            subtree_lines = build_tree_visual(
-                base / name, data, prefix + extension, is_last_item
-            )
-            lines.extend(subtree_lines)
+            stack.extend(reversed(tree_items(table, child, prefix + extension)))
         else:
             # File
             lines.append(f"{prefix}{connector}{name}")
@@ -229,99 +549,81 @@ def build_tree_visual(
     return lines
 
 
-def write_section(md: List[str], title: str):
-    """Write a section header to the markdown list."""
-    md.append("")
-    md.append(title)
-    md.append("")
+def write_section(md: TextIO, title: str):
+    """Write a section header to the markdown output."""
+    md.write(f"\n{title}\n\n")
 
 
-def write_file_list(md: List[str], folder_path: Path, tree: Dict, root: Path = None):
+def write_file_list(md: TextIO, files: List[Tuple[str, str, int]], rel_prefix: str = ""):
     """Write a list of files in a directory."""
-    if root is None:
-        root = SRC_DIR
-    for filename, desc, lines in tree["files"]:
-        file_path = folder_path / filename
-        rel = file_path.relative_to(root)
-
+    for filename, desc, lines in files:
         # Format with proper styling
-        if desc != "No description available.":
-            md.append(
-                f"- **[{filename}]({rel.as_posix()})** – `{lines} LoEC (Lines of Executable Code)` – {desc}"
-            )
-        else:
-            md.append(
-                f"- **[{filename}]({rel.as_posix()})** – `{lines} LoEC (Lines of Executable Code)`"
+        template = FILE_ENTRY_WITH_DESC if desc is not NO_DESC else FILE_ENTRY
+        md.write(
+            template.format_map(
+                {"name": filename, "rel": rel_prefix + filename, "lines": lines, "desc": desc}
             )
+        )
 
 
-def write_directory(md: List[str], base: Path, tree: Dict, level: int = 0, root: Path = None):
-    """Recursively write directory structure to markdown."""
-    if root is None:
-        root = SRC_DIR
-    for dirname, subtree in sorted(tree["dirs"].items()):
-        full = base / dirname
-        desc = describe(full, root)
+def write_directory(
+    md: TextIO,
+    table: DirTable,
+    index: int,
+    level: int = 0,
+    rel_prefix: str = "",
+):
+    """Write the directory structure below `index` to markdown, depth first."""
+    # Children are pushed in reverse so they pop off the stack in display order
+    stack = deque((child, level, rel_prefix) for child in reversed(table.children[index]))
+    while stack:
+        child, level, rel_prefix = stack.pop()
+        dirname = table.name[child]
+        rel = rel_prefix + dirname
+        desc = table.desc[child]
 
         # Create heading with description
         heading = f"{'#' * (3 + level)} {dirname}/"
-        if desc != "No description available.":
+        if desc is not NO_DESC:
             heading += f" – {desc}"
 
         write_section(md, heading)
 
         # Write files in this directory
-        if subtree["files"]:
-            write_file_list(md, full, subtree, root)
+        if table.files[child]:
+            write_file_list(md, table.files[child], f"{rel}/")
         else:
-            md.append("*No files in this directory.*")
-
-        # Recurse into subdirectories
-        if subtree["dirs"]:
-            write_directory(md, full, subtree, level + 1, root)
-
+            md.write("*No files in this directory.*\n")
 
-def count_total_lines(tree: Dict) -> int:
-    """Recursively count total lines in all files."""
-    total = sum(lines for _, _, lines in tree["files"])
-    for subtree in tree["dirs"].values():
-        total += count_total_lines(subtree)
-    return total
-
-
-def count_total_files(tree: Dict) -> int:
-    """Recursively count total number of files."""
-    total = len(tree["files"])
-    for subtree in tree["dirs"].values():
-        total += count_total_files(subtree)
-    return total
+        # Descend into subdirectories next
+        stack.extend(
+            (grandchild, level + 1, f"{rel}/") for grandchild in reversed(table.children[child])
+        )
 
 
 def generate_source_map():
     """Generate the complete source map documentation."""
     now = datetime.now().strftime("%x %X")
 
-    # Generate trees for src/ and tests/
-    src_tree = generate_tree(SRC_DIR)
-    tests_tree = generate_tree(TESTS_DIR, TESTS_DIR)
+    cache = load_cache()
 
-    src_lines = count_total_lines(src_tree)
-    src_files = count_total_files(src_tree)
-    test_lines = count_total_lines(tests_tree)
-    test_files = count_total_files(tests_tree)
+    # Generate trees for src/ and tests/
+    table = DirTable()
+    src_root, src_files, src_lines = generate_tree(table, SRC_DIR, DESCRIPTIONS, cache)
+    tests_root, test_files, test_lines = generate_tree(table, TESTS_DIR, TEST_DESCRIPTIONS, cache)
     total_lines = src_lines + test_lines
     total_files = src_files + test_files
 
     # Build dynamic tree visuals
     src_tree_lines = ["src/"]
-    src_tree_lines.extend(build_tree_visual(SRC_DIR, src_tree))
+    src_tree_lines.extend(build_tree_visual(table, src_root))
 
     tests_tree_lines = ["tests/"]
-    tests_tree_lines.extend(build_tree_visual(TESTS_DIR, tests_tree))
+    tests_tree_lines.extend(build_tree_visual(table, tests_root))
 
     tree_visual = "\n".join(src_tree_lines + [""] + tests_tree_lines)
 
-    md = [
+    header = [
         "# Cerium: Source Map (Auto-Generated)",
         "",
         "> [!WARNING]",
@@ -340,42 +642,47 @@ def generate_source_map():
         "```",
     ]
 
-    # Entry point
-    write_section(md, "## Entry Point")
     main_path = SRC_DIR / "main.rs"
-    if main_path.exists():
-        main_lines = line_count(main_path)
-        md.append(
-            f"- **[main.rs](main.rs)** – `{main_lines} lines` – {describe(main_path)}"
-        )
+    main_lines = next((lines for name, _, lines in table.files[src_root] if name == "main.rs"), None)
 
-    # Recursively write all directories under src
-    write_section(md, "## Modules")
-    write_directory(md, SRC_DIR, src_tree)
-
-    # Tests section
-    write_section(md, "## Tests")
-
-    # Write test files at top level
-    if tests_tree["files"]:
-        write_file_list(md, TESTS_DIR, tests_tree, TESTS_DIR)
-
-    # Write test subdirectories (e.g., common/)
-    if tests_tree["dirs"]:
-        write_directory(md, TESTS_DIR, tests_tree, level=0, root=TESTS_DIR)
-
-    # Footer
-    md.extend(
-        [
-            "",
-            "---",
-            "",
-            f"*Generated by [generate_source_map.py](../scripts/generate_source_map.py) on {now}*",
-        ]
-    )
+    # Stream the document to a sibling temp file and swap it into place only
+    # once it is complete, so a failed run leaves the previous source map intact
+    tmp_file = OUTPUT_FILE.with_name(f".{OUTPUT_FILE.name}.tmp")
+    try:
+        with tmp_file.open("w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE) as md:
+            md.write("\n".join(header) + "\n")
+
+            # Entry point
+            write_section(md, "## Entry Point")
+            if main_lines is not None:
+                md.write(f"- **[main.rs](main.rs)** – `{main_lines} lines` – {describe(main_path)}\n")
+
+            # Recursively write all directories under src
+            write_section(md, "## Modules")
+            write_directory(md, table, src_root)
+
+            # Tests section
+            write_section(md, "## Tests")
+
+            # Write test files at top level
+            if table.files[tests_root]:
+                write_file_list(md, table.files[tests_root])
+
+            # Write test subdirectories (e.g., common/)
+            if table.children[tests_root]:
+                write_directory(md, table, tests_root)
+
+            # Footer
+            md.write(
+                "\n---\n\n"
+                f"*Generated by [generate_source_map.py](../scripts/generate_source_map.py) on {now}*\n"
+            )
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_file, OUTPUT_FILE)
 
-    # Write output
-    OUTPUT_FILE.write_text("\n".join(md), encoding="utf-8")
+    save_cache(cache)
     print(f"   \033[1;32mGenerated\033[0m source map saved at {OUTPUT_FILE}")
     print(
         f"       \033[1;36mStats\033[0m {total_files} files, {total_lines:,} LoEC (Lines of Executable Code)"